@@ -11,14 +11,19 @@ import json
 import os
 import sys
 import time
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 
-import schedule
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from scraper import get_apartments, STATUS_FREE, STATUS_OCCUPIED, STATUS_RESERVED
-from notifier import notify_available
+from notifier import Notifier
 
 BASE_DIR = Path(__file__).parent
 STATE_FILE = BASE_DIR / "state.json"
@@ -51,15 +56,22 @@ def load_config():
 def load_state():
     """Load previous apartment state from file."""
     if STATE_FILE.exists():
+        if orjson is not None:
+            return orjson.loads(STATE_FILE.read_bytes())
         with open(STATE_FILE, "r") as f:
             return json.load(f)
     return None
 
 
 def save_state(apartments):
-    """Save current apartment state to file."""
-    with open(STATE_FILE, "w") as f:
-        json.dump(apartments, f, indent=2, ensure_ascii=False)
+    """Save current apartment state to file (atomically, via a temp file)."""
+    tmp_file = STATE_FILE.with_suffix(".json.tmp")
+    if orjson is not None:
+        tmp_file.write_bytes(orjson.dumps(apartments, option=orjson.OPT_INDENT_2))
+    else:
+        with open(tmp_file, "w") as f:
+            json.dump(apartments, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_file, STATE_FILE)
 
 
 def find_newly_available(previous, current):
@@ -70,53 +82,66 @@ def find_newly_available(previous, current):
     if previous is None:
         return {}  # First run, don't alert
 
-    newly_available = {}
-    for apt_id, info in current.items():
-        was_unavailable = True
-        prev_info = previous.get(apt_id)
-        if prev_info:
-            was_unavailable = prev_info.get("status") in (STATUS_OCCUPIED, STATUS_RESERVED)
-
-        is_available = info["status"] == STATUS_FREE
-        # Also consider "unknown" status with rent info as potentially available
-        if info["status"] == "unknown" and info.get("rent"):
-            is_available = True
+    # Build the two sides as sets so the diff itself runs in C
+    prev_unavailable = {
+        k for k, v in previous.items()
+        if v.get("status") in (STATUS_OCCUPIED, STATUS_RESERVED)
+    }
+    # "unknown" status with rent info also counts as potentially available
+    curr_available = {
+        k for k, v in current.items()
+        if v["status"] == STATUS_FREE or (v["status"] == "unknown" and v.get("rent"))
+    }
 
-        if is_available and was_unavailable:
-            newly_available[apt_id] = info
+    # Newly available: was occupied/reserved before, or never seen before
+    newly_ids = (curr_available & prev_unavailable) | (curr_available - previous.keys())
+    return {k: current[k] for k in newly_ids}
 
-    return newly_available
 
-
-def check_availability(config, first_run=False):
-    """Perform a single availability check."""
+def check_availability(config, previous, notifier):
+    """
+    Perform a single availability check.
+    Takes the previous apartment state (or None on first run) and returns the
+    new state, so the caller keeps it in memory between checks instead of
+    re-reading state.json every tick.
+    """
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"\n[{now}] Checking apartment availability...")
 
     try:
-        apartments = get_apartments()
+        apartments, unchanged = get_apartments()
     except Exception as e:
         print(f"  ERROR fetching apartments: {e}")
-        return
+        return previous
 
     if not apartments:
         print("  WARNING: No apartments found. Page structure may have changed.")
-        return
+        return previous
+
+    # Identical page as last tick: nothing to count, diff or save
+    if unchanged and previous is not None:
+        print("  No change since last check.")
+        return previous
+
+    # Count statuses and collect free/reserved apartments in a single pass
+    counts = Counter()
+    free_apts = []
+    reserved_apts = []
+    for apt_id, info in apartments.items():
+        status = info["status"]
+        counts[status] += 1
+        if status == STATUS_FREE:
+            free_apts.append((apt_id, info))
+        elif status == STATUS_RESERVED:
+            reserved_apts.append((apt_id, info))
 
-    free_count = sum(1 for a in apartments.values() if a["status"] == STATUS_FREE)
-    unknown_count = sum(1 for a in apartments.values() if a["status"] == "unknown")
     total = len(apartments)
+    print(f"  Found {total} apartments: {counts[STATUS_FREE]} free, {counts[STATUS_RESERVED]} reserved, {counts[STATUS_OCCUPIED]} occupied, {counts['unknown']} unknown")
 
-    reserved_count = sum(1 for a in apartments.values() if a["status"] == STATUS_RESERVED)
-    occupied_count = sum(1 for a in apartments.values() if a["status"] == STATUS_OCCUPIED)
-
-    print(f"  Found {total} apartments: {free_count} free, {reserved_count} reserved, {occupied_count} occupied, {unknown_count} unknown")
-
-    # Log free apartments
-    free_apts = {k: v for k, v in apartments.items() if v["status"] == STATUS_FREE}
+    # Log free apartments (already in natural order from the scraper)
     if free_apts:
         print(f"  Free apartments:")
-        for apt_id, info in sorted(free_apts.items()):
+        for apt_id, info in free_apts:
             size = info.get("size", "N/A")
             total = info.get("total", "N/A")
             print(f"    - {info['name']} | {info['type']} | {size} | Total: {total}")
@@ -124,22 +149,20 @@ def check_availability(config, first_run=False):
         print("  No free apartments right now.")
 
     # Log reserved apartments
-    reserved_apts = {k: v for k, v in apartments.items() if v["status"] == STATUS_RESERVED}
     if reserved_apts:
         print(f"  Reserved apartments:")
-        for apt_id, info in sorted(reserved_apts.items()):
+        for apt_id, info in reserved_apts:
             size = info.get("size", "N/A")
             total = info.get("total", "N/A")
             print(f"    - {info['name']} | {info['type']} | {size} | Total: {total}")
     else:
         print("  No reserved apartments right now.")
 
-    if first_run:
+    if previous is None:
         print("  First run - saving initial state (no notification sent).")
         save_state(apartments)
-        return
+        return apartments
 
-    previous = load_state()
     newly_available = find_newly_available(previous, apartments)
 
     if newly_available:
@@ -148,13 +171,14 @@ def check_availability(config, first_run=False):
             print(f"    -> {info['name']} ({info['type']})")
 
         try:
-            notify_available(config, newly_available)
+            notifier.notify_available(newly_available)
         except Exception as e:
             print(f"  ERROR sending notification: {e}")
     else:
         print("  No new availability.")
 
     save_state(apartments)
+    return apartments
 
 
 def main():
@@ -168,29 +192,37 @@ def main():
     print(f"  Monitoring: https://www.campus-living-darmstadt.de/mieten")
     print(f"  Notifications: {config['EMAIL_TO']}")
 
-    is_first_run = not STATE_FILE.exists()
+    # Loaded once at startup; afterwards the state lives in memory and only
+    # save_state touches disk.
+    state = load_state()
+
+    # One notifier for the whole run so the SMTP connection is reused across
+    # notifications instead of re-authenticating every send.
+    notifier = Notifier(config)
 
     if single_run:
         print(f"  Mode: Single check")
         print("=" * 50)
-        check_availability(config, first_run=is_first_run)
+        check_availability(config, state, notifier)
+        notifier.close()
     else:
         print(f"  Interval: Every {interval} minutes")
         print(f"  Mode: Continuous (Ctrl+C to stop)")
         print("=" * 50)
 
-        # Run immediately
-        check_availability(config, first_run=is_first_run)
-
-        # Schedule subsequent checks
-        schedule.every(interval).minutes.do(check_availability, config)
-
+        # Run immediately, then sleep exactly until the next check is due
+        # instead of waking every second to poll a scheduler.
         try:
+            next_run = time.monotonic()
             while True:
-                schedule.run_pending()
-                time.sleep(1)
+                state = check_availability(config, state, notifier)
+                next_run += interval * 60
+                sleep_for = max(0, next_run - time.monotonic())
+                time.sleep(sleep_for)
         except KeyboardInterrupt:
             print("\n\nStopped by user. Goodbye!")
+        finally:
+            notifier.close()
 
 
 if __name__ == "__main__":
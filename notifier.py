@@ -6,69 +6,36 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
-
-def send_email(smtp_host, smtp_port, email_from, email_password, email_to, subject, body_html):
-    """Send an email notification via SMTP."""
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = subject
-    msg["From"] = email_from
-    msg["To"] = email_to
-
-    # Plain text fallback
-    plain_text = body_html.replace("<br>", "\n").replace("</li>", "\n")
-    import re
-    plain_text = re.sub(r"<[^>]+>", "", plain_text)
-
-    msg.attach(MIMEText(plain_text, "plain"))
-    msg.attach(MIMEText(body_html, "html"))
-
-    with smtplib.SMTP(smtp_host, int(smtp_port)) as server:
-        server.starttls()
-        server.login(email_from, email_password)
-        server.sendmail(email_from, email_to.split(","), msg.as_string())
-
-
-def build_availability_email(newly_free_apartments):
-    """
-    Build email subject and HTML body for newly available apartments.
-    Returns (subject, body_html).
-    """
-    count = len(newly_free_apartments)
-    subject = f"🏠 {count} apartment(s) now available at Campus Living Darmstadt!"
-
-    td = "padding: 8px; border: 1px solid #ccc; text-align: left;"
-    rows = ""
-    for apt_id, info in sorted(newly_free_apartments.items()):
-        size = info.get('size', '')
-        kaltmiete = info.get('kaltmiete', '')
-        nebenkosten = info.get('nebenkosten', '')
-        total = info.get('total', 'N/A')
-        rows += (
-            f"<tr>"
-            f"<td style=\"{td}\">{apt_id}</td>"
-            f"<td style=\"{td}\">{info['type']}</td>"
-            f"<td style=\"{td}\">{size}</td>"
-            f"<td style=\"{td}\">{kaltmiete}</td>"
-            f"<td style=\"{td}\">{nebenkosten}</td>"
-            f"<td style=\"{td}\"><strong>{total}</strong></td>"
-            f"</tr>\n"
-        )
-
-    body_html = f"""
+# The HTML shell and row markup are static; build them once at import time
+# so each notification only formats the dynamic values.
+_TD_STYLE = "padding: 8px; border: 1px solid #ccc; text-align: left;"
+
+_ROW_TEMPLATE = (
+    f'<tr>'
+    f'<td style="{_TD_STYLE}">{{apt_id}}</td>'
+    f'<td style="{_TD_STYLE}">{{apt_type}}</td>'
+    f'<td style="{_TD_STYLE}">{{size}}</td>'
+    f'<td style="{_TD_STYLE}">{{kaltmiete}}</td>'
+    f'<td style="{_TD_STYLE}">{{nebenkosten}}</td>'
+    f'<td style="{_TD_STYLE}"><strong>{{total}}</strong></td>'
+    f'</tr>\n'
+)
+
+_EMAIL_TEMPLATE = f"""
     <html>
     <body style="font-family: Arial, sans-serif; max-width: 600px;">
         <h2 style="color: #2e7d32;">Room Available at Campus Living Darmstadt!</h2>
-        <p>{count} apartment(s) just became available:</p>
+        <p>{{count}} apartment(s) just became available:</p>
         <table style="border-collapse: collapse; width: 100%;">
             <tr style="background: #e8f5e9;">
-                <th style="padding: 8px; border: 1px solid #ccc; text-align: left;">Apartment</th>
-                <th style="padding: 8px; border: 1px solid #ccc; text-align: left;">Type</th>
-                <th style="padding: 8px; border: 1px solid #ccc; text-align: left;">Size</th>
-                <th style="padding: 8px; border: 1px solid #ccc; text-align: left;">Kaltmiete</th>
-                <th style="padding: 8px; border: 1px solid #ccc; text-align: left;">Nebenkosten</th>
-                <th style="padding: 8px; border: 1px solid #ccc; text-align: left;">Total</th>
+                <th style="{_TD_STYLE}">Apartment</th>
+                <th style="{_TD_STYLE}">Type</th>
+                <th style="{_TD_STYLE}">Size</th>
+                <th style="{_TD_STYLE}">Kaltmiete</th>
+                <th style="{_TD_STYLE}">Nebenkosten</th>
+                <th style="{_TD_STYLE}">Total</th>
             </tr>
-            {rows}
+            {{rows}}
         </table>
         <p style="margin-top: 16px;">
             <a href="https://www.campus-living-darmstadt.de/mieten"
@@ -83,24 +50,129 @@ def build_availability_email(newly_free_apartments):
     </html>
     """
 
-    return subject, body_html
 
+def _build_message(email_from, email_to, subject, body_html, body_text=None):
+    """Build a multipart message with an optional plain-text fallback."""
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"] = email_from
+    msg["To"] = email_to
 
-def notify_available(config, newly_free_apartments):
-    """Send notification about newly available apartments."""
-    if not newly_free_apartments:
-        return
+    if body_text:
+        msg.attach(MIMEText(body_text, "plain"))
+    msg.attach(MIMEText(body_html, "html"))
+    return msg
 
-    subject, body_html = build_availability_email(newly_free_apartments)
 
-    send_email(
-        smtp_host=config["SMTP_HOST"],
-        smtp_port=config["SMTP_PORT"],
-        email_from=config["EMAIL_FROM"],
-        email_password=config["EMAIL_PASSWORD"],
-        email_to=config["EMAIL_TO"],
-        subject=subject,
-        body_html=body_html,
+class Notifier:
+    """
+    Sends email alerts over a single persistent SMTP connection.
+
+    Opening a fresh SMTP+STARTTLS+AUTH session costs several round-trips,
+    which adds up when multiple apartments go free in a burst. The connection
+    is validated with NOOP before each send and reopened transparently if the
+    server has dropped it.
+    """
+
+    def __init__(self, config):
+        self.smtp_host = config["SMTP_HOST"]
+        self.smtp_port = int(config["SMTP_PORT"])
+        self.email_from = config["EMAIL_FROM"]
+        self.email_password = config["EMAIL_PASSWORD"]
+        self.email_to = config["EMAIL_TO"]
+        self._smtp = None
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.smtp_host, self.smtp_port)
+        smtp.starttls()
+        smtp.login(self.email_from, self.email_password)
+        self._smtp = smtp
+
+    def _connection(self):
+        """Return a live SMTP connection, reconnecting if the old one died."""
+        if self._smtp is not None:
+            try:
+                self._smtp.noop()
+                return self._smtp
+            except (smtplib.SMTPException, OSError):
+                self._smtp = None
+        self._connect()
+        return self._smtp
+
+    def send(self, subject, body_html, body_text=None):
+        """Send an email over the persistent connection."""
+        msg = _build_message(self.email_from, self.email_to, subject, body_html, body_text)
+        recipients = self.email_to.split(",")
+        try:
+            self._connection().sendmail(self.email_from, recipients, msg.as_string())
+        except smtplib.SMTPServerDisconnected:
+            # Server closed the session between NOOP and sendmail; retry once
+            self._smtp = None
+            self._connection().sendmail(self.email_from, recipients, msg.as_string())
+
+    def notify_available(self, newly_free_apartments):
+        """Send notification about newly available apartments."""
+        if not newly_free_apartments:
+            return
+
+        subject, body_html, body_text = build_availability_email(newly_free_apartments)
+        self.send(subject, body_html, body_text)
+        print(f"  Email sent to {self.email_to}")
+
+    def close(self):
+        """Close the SMTP connection if open."""
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+
+def send_email(smtp_host, smtp_port, email_from, email_password, email_to, subject, body_html, body_text=None):
+    """Send a single email over a one-shot SMTP connection."""
+    msg = _build_message(email_from, email_to, subject, body_html, body_text)
+
+    with smtplib.SMTP(smtp_host, int(smtp_port)) as server:
+        server.starttls()
+        server.login(email_from, email_password)
+        server.sendmail(email_from, email_to.split(","), msg.as_string())
+
+
+def build_availability_email(newly_free_apartments):
+    """
+    Build email subject, HTML body and plain-text body for newly available
+    apartments. Returns (subject, body_html, body_text).
+    """
+    count = len(newly_free_apartments)
+    subject = f"🏠 {count} apartment(s) now available at Campus Living Darmstadt!"
+
+    rows_html = []
+    rows_text = []
+    # Sort keys only; the value dicts are looked up in the loop
+    for apt_id in sorted(newly_free_apartments):
+        info = newly_free_apartments[apt_id]
+        size = info.get('size', '')
+        kaltmiete = info.get('kaltmiete', '')
+        nebenkosten = info.get('nebenkosten', '')
+        total = info.get('total', 'N/A')
+        rows_html.append(_ROW_TEMPLATE.format(
+            apt_id=apt_id,
+            apt_type=info['type'],
+            size=size,
+            kaltmiete=kaltmiete,
+            nebenkosten=nebenkosten,
+            total=total,
+        ))
+        rows_text.append(f"{apt_id} | {info['type']} | {size} | {kaltmiete} | {nebenkosten} | {total}")
+
+    body_html = _EMAIL_TEMPLATE.format(count=count, rows="".join(rows_html))
+
+    body_text = (
+        "Room Available at Campus Living Darmstadt!\n\n"
+        f"{count} apartment(s) just became available:\n\n"
+        + "\n".join(rows_text)
+        + "\n\nhttps://www.campus-living-darmstadt.de/mieten\n"
     )
 
-    print(f"  Email sent to {config['EMAIL_TO']}")
+    return subject, body_html, body_text
@@ -3,22 +3,52 @@ Scraper for Campus Living Darmstadt apartment availability.
 Fetches https://www.campus-living-darmstadt.de/mieten and extracts apartment statuses.
 """
 
+import hashlib
+import json
 import re
 import html as html_lib
+from pathlib import Path
+
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import html as lxml_html
 
 URL = "https://www.campus-living-darmstadt.de/mieten"
 
+# Stores ETag/Last-Modified validators so steady-state polls can be answered
+# with an empty 304 instead of the full page download.
+HTTP_CACHE_FILE = Path(__file__).parent / "http_cache.json"
+
 STATUS_FREE = "free"
 STATUS_RESERVED = "reserved"
 STATUS_OCCUPIED = "occupied"
 STATUS_UNKNOWN = "unknown"
 
-
-def fetch_page(url=URL):
-    """Fetch the rental page HTML."""
-    headers = {
+# Compiled once at import time; these run for every apartment on every poll.
+_BR_RE = re.compile(r"<br\s*/?>")
+_TAG_RE = re.compile(r"<[^>]+>")
+_NUM_RE = re.compile(r"(\d+)")
+_NR_SUFFIX_RE = re.compile(r"\s*Nr\.\s*\S+\s*$")
+# Pulls size and rent figures out of the unescaped data-text in one scan,
+# relying on the site's fixed field order (Größe, Miethöhe, Nebenkosten).
+_DETAILS_RE = re.compile(
+    r"Größe:\s*([^<]+?)<br.*?Miethöhe:\s*(\d+).*?Nebenkosten:\s*(\d+)", re.DOTALL
+)
+
+# Reuse one session for the lifetime of the process so the TLS connection
+# stays warm between scheduled checks instead of re-handshaking every poll.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=2,
+        pool_maxsize=4,
+        max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504]),
+    ),
+)
+_SESSION.headers.update(
+    {
         "User-Agent": (
             "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
             "AppleWebKit/537.36 (KHTML, like Gecko) "
@@ -26,20 +56,85 @@ def fetch_page(url=URL):
         ),
         "Accept-Language": "de-DE,de;q=0.9,en;q=0.8",
     }
-    response = requests.get(url, headers=headers, timeout=30)
+)
+
+
+def _load_http_cache():
+    """Load cached ETag/Last-Modified validators from file."""
+    if HTTP_CACHE_FILE.exists():
+        try:
+            with open(HTTP_CACHE_FILE, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+
+def _save_http_cache(cache):
+    """Save ETag/Last-Modified validators to file."""
+    try:
+        with open(HTTP_CACHE_FILE, "w") as f:
+            json.dump(cache, f, indent=2)
+    except OSError:
+        pass
+
+
+_HTTP_CACHE = _load_http_cache()
+
+
+def fetch_page(url=URL):
+    """
+    Fetch the rental page and return (content, encoding): the decoded
+    (un-gzipped) bytes plus the charset declared in the Content-Type header,
+    or None for the charset if the header doesn't name one. Returning bytes
+    instead of response.text skips a full unicode copy of the page; the
+    charset is passed along so the parser doesn't depend on an in-document
+    <meta charset> tag.
+    Sends the stored ETag/Last-Modified as conditional headers; returns None
+    when the server answers 304 Not Modified (page unchanged since last fetch).
+    """
+    headers = {}
+    if _HTTP_CACHE.get("etag"):
+        headers["If-None-Match"] = _HTTP_CACHE["etag"]
+    if _HTTP_CACHE.get("last_modified"):
+        headers["If-Modified-Since"] = _HTTP_CACHE["last_modified"]
+
+    response = _SESSION.get(url, headers=headers, timeout=30, stream=True)
+    if response.status_code == 304:
+        response.close()
+        return None
     response.raise_for_status()
-    return response.text
+
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified:
+        _HTTP_CACHE["etag"] = etag
+        _HTTP_CACHE["last_modified"] = last_modified
+        _save_http_cache(_HTTP_CACHE)
+
+    # Only trust response.encoding when the header actually declares a
+    # charset; requests falls back to ISO-8859-1 for text/* otherwise.
+    encoding = None
+    if "charset=" in response.headers.get("Content-Type", "").lower():
+        encoding = response.encoding
+
+    return response.content, encoding
+
+
+_STATUS_BY_TOKEN = {
+    "free": STATUS_FREE,
+    "reserved": STATUS_RESERVED,
+    "occupied": STATUS_OCCUPIED,
+}
 
 
 def _detect_status(classes):
     """Detect status from CSS class list."""
-    class_str = " ".join(classes).lower()
-    if "free" in class_str:
-        return STATUS_FREE
-    if "reserved" in class_str:
-        return STATUS_RESERVED
-    if "occupied" in class_str:
-        return STATUS_OCCUPIED
+    token_status = _STATUS_BY_TOKEN.get
+    for c in classes:
+        status = token_status(c.lower())
+        if status:
+            return status
     return STATUS_UNKNOWN
 
 
@@ -47,17 +142,29 @@ def _detect_status_from_data_text(data_text):
     """Detect status from the data-text attribute HTML content."""
     if not data_text:
         return STATUS_UNKNOWN
-    # Double-unescape since the attribute can be double-encoded
-    text = html_lib.unescape(html_lib.unescape(data_text))
-    if "unit_free" in text:
+    # The status tokens contain no entities, so the raw attribute can be
+    # searched directly without unescaping.
+    if "unit_free" in data_text:
         return STATUS_FREE
-    if "unit_reserved" in text:
+    if "unit_reserved" in data_text:
         return STATUS_RESERVED
-    if "unit_occupied" in text:
+    if "unit_occupied" in data_text:
         return STATUS_OCCUPIED
     return STATUS_UNKNOWN
 
 
+def _unescape_data_text(data_text):
+    """
+    Unescape the data-text attribute. The attribute is sometimes double-
+    encoded; the second pass only runs when entities survive the first one.
+    """
+    unescape = html_lib.unescape
+    text = unescape(data_text)
+    if "&" in text:
+        text = unescape(text)
+    return text
+
+
 def _parse_data_text(data_text):
     """
     Parse the data-text attribute which contains apartment details as HTML.
@@ -68,13 +175,13 @@ def _parse_data_text(data_text):
     if not data_text:
         return {}
 
-    # Double-unescape since the attribute can be double-encoded
-    text = html_lib.unescape(html_lib.unescape(data_text))
-    parts = re.split(r"<br\s*/?>", text)
+    text = _unescape_data_text(data_text)
+    parts = _BR_RE.split(text)
     details = {}
 
+    sub_tags = _TAG_RE.sub
     for part in parts:
-        clean = re.sub(r"<[^>]+>", "", part).strip()
+        clean = sub_tags("", part).strip()
         if not clean:
             continue
         if ":" in clean:
@@ -84,51 +191,94 @@ def _parse_data_text(data_text):
     return details
 
 
-def parse_apartments(html):
+def _natural_key(apt_number):
+    """Sort key that orders apartment numbers numerically ("2.1" < "10.1")."""
+    return [int(p) if p.isdigit() else p for p in _NUM_RE.split(apt_number)]
+
+
+def parse_apartments(html, encoding=None):
     """
-    Parse the HTML and extract apartment information with availability status.
-    Returns a dict mapping apartment ID to info dict.
+    Parse the HTML (str or bytes) and extract apartment information with
+    availability status. For bytes input, pass the charset from the HTTP
+    Content-Type header as encoding — lxml itself only sniffs an in-document
+    <meta charset> declaration. Returns a dict mapping apartment ID to info
+    dict.
     """
-    soup = BeautifulSoup(html, "html.parser")
+    if encoding:
+        doc = lxml_html.fromstring(html, parser=lxml_html.HTMLParser(encoding=encoding))
+    else:
+        doc = lxml_html.fromstring(html)
     apartments = {}
 
     # Apartments are <a> tags with class "apartment" and href="#detail"
-    apt_links = soup.find_all("a", class_="apartment", href="#detail")
+    apt_links = doc.cssselect('a.apartment[href="#detail"]')
+
+    # Bind hot helpers to locals; the loop can run hundreds of times per poll
+    detect_status = _detect_status
+    detect_status_fallback = _detect_status_from_data_text
+    unescape_data_text = _unescape_data_text
+    suffix_sub = _NR_SUFFIX_RE.sub
+    details_search = _DETAILS_RE.search
 
     seen = set()
     for link in apt_links:
-        apt_number = link.get_text(strip=True)
+        apt_number = link.text_content().strip()
         if not apt_number or apt_number in seen:
             continue
         seen.add(apt_number)
 
-        classes = link.get("class", [])
-        title = link.get("title", "").strip()
-        data_text = link.get("data-text", "")
+        attrs = link.attrib
+        classes = attrs.get("class", "").split()
+        title = attrs.get("title", "").strip()
+        data_text = attrs.get("data-text", "")
 
         # Type from title (e.g., "Komfort-Apartment Nr. 0.1")
-        apt_type = re.sub(r"\s*Nr\.\s*\S+\s*$", "", title).strip()
+        apt_type = suffix_sub("", title).strip()
 
         # Try CSS classes first, fall back to data-text content
-        status = _detect_status(classes)
+        status = detect_status(classes)
         if status == STATUS_UNKNOWN:
-            status = _detect_status_from_data_text(data_text)
-        details = _parse_data_text(data_text)
-
-        kaltmiete_str = details.get("Miethöhe", "")
-        nebenkosten_str = details.get("Nebenkosten", "")
-
-        # Parse numeric values (e.g., "695 €" -> 695)
-        kaltmiete = 0
-        nebenkosten = 0
-        if kaltmiete_str:
-            m = re.search(r"(\d+)", kaltmiete_str)
-            if m:
-                kaltmiete = int(m.group(1))
-        if nebenkosten_str:
-            m = re.search(r"(\d+)", nebenkosten_str)
-            if m:
-                nebenkosten = int(m.group(1))
+            status = detect_status_fallback(data_text)
+
+        # Occupied apartments are never notified or displayed with rent
+        # details, so skip the expensive extraction for them (the majority).
+        if status == STATUS_OCCUPIED:
+            apartments[apt_number] = {
+                "name": f"Apartment {apt_number}",
+                "type": apt_type or "Unknown",
+                "status": STATUS_OCCUPIED,
+                "size": "",
+                "kaltmiete": "",
+                "nebenkosten": "",
+                "total": "",
+            }
+            continue
+
+        # Fast path: one regex sweep over the unescaped attribute
+        text = unescape_data_text(data_text) if data_text else ""
+        m = details_search(text)
+        if m:
+            size = m.group(1).strip()
+            kaltmiete = int(m.group(2))
+            nebenkosten = int(m.group(3))
+        else:
+            # Fallback: full key/value parse (field order changed or missing)
+            details = _parse_data_text(data_text)
+            size = details.get("Größe", "")
+            kaltmiete_str = details.get("Miethöhe", "")
+            nebenkosten_str = details.get("Nebenkosten", "")
+
+            # Parse numeric values (e.g., "695 €" -> 695)
+            kaltmiete = 0
+            nebenkosten = 0
+            if kaltmiete_str:
+                m = _NUM_RE.search(kaltmiete_str)
+                if m:
+                    kaltmiete = int(m.group(1))
+            if nebenkosten_str:
+                m = _NUM_RE.search(nebenkosten_str)
+                if m:
+                    nebenkosten = int(m.group(1))
 
         total = kaltmiete + nebenkosten
 
@@ -136,27 +286,58 @@ def parse_apartments(html):
             "name": f"Apartment {apt_number}",
             "type": apt_type or "Unknown",
             "status": status,
-            "size": details.get("Größe", ""),
+            "size": size,
             "kaltmiete": f"{kaltmiete} €" if kaltmiete else "",
             "nebenkosten": f"{nebenkosten} €" if nebenkosten else "",
             "total": f"{total} €" if total else "",
         }
 
-    return apartments
+    # Emit in natural apartment-number order; dicts preserve insertion
+    # order, so downstream display code never has to re-sort.
+    return {k: apartments[k] for k in sorted(apartments, key=_natural_key)}
+
+
+# Last successfully parsed result, reused when the server answers 304 or
+# sends a byte-identical body (matched via _LAST_HASH).
+_LAST_HASH = None
+_LAST_RESULT = None
 
 
 def get_apartments():
-    """Fetch and parse current apartment availability. Main entry point."""
-    html = fetch_page()
-    return parse_apartments(html)
+    """
+    Fetch and parse current apartment availability. Main entry point.
+    Returns (apartments, unchanged); unchanged is True when the page is
+    identical to the previous call (304 or matching body hash), in which
+    case the caller can skip its own diffing and bookkeeping.
+    """
+    global _LAST_HASH, _LAST_RESULT
 
+    fetched = fetch_page()
+    if fetched is None:
+        if _LAST_RESULT is not None:
+            return _LAST_RESULT, True
+        # 304 from a stale cache file but nothing parsed in memory yet
+        # (fresh process) — drop the validators and fetch unconditionally.
+        _HTTP_CACHE.clear()
+        fetched = fetch_page()
+    html, encoding = fetched
 
-if __name__ == "__main__":
-    print("Fetching page...")
-    html = fetch_page()
+    # Even without ETag support the body is usually identical between polls;
+    # hash it and skip the parse entirely on a match.
+    h = hashlib.blake2b(html, digest_size=16).digest()
+    if h == _LAST_HASH and _LAST_RESULT is not None:
+        return _LAST_RESULT, True
+
+    _LAST_RESULT = parse_apartments(html, encoding)
+    _LAST_HASH = h
+    return _LAST_RESULT, False
 
-    print("Parsing apartments...")
-    apts = parse_apartments(html)
+
+if __name__ == "__main__":
+    print("Fetching and parsing apartments...")
+    # get_apartments handles a 304 from stored validators; calling
+    # fetch_page directly here could return None after the tracker has polled
+    apts, _ = get_apartments()
 
     if not apts:
         print("No apartments found! The page structure may have changed.")
@@ -174,10 +355,10 @@ if __name__ == "__main__":
 
         if free:
             print("\nFREE apartments:")
-            for apt_id, info in sorted(free.items()):
+            for apt_id, info in free.items():
                 print(f"  {info['name']} - {info['type']} - {info['size']} - Total: {info['total']}")
 
         if reserved:
             print(f"\nReserved apartments (first 5):")
-            for apt_id, info in list(sorted(reserved.items()))[:5]:
+            for apt_id, info in list(reserved.items())[:5]:
                 print(f"  {info['name']} - {info['type']} - {info['size']} - Total: {info['total']}")